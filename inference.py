@@ -36,6 +36,13 @@ def parse_args() -> argparse.Namespace:
         help="inference batch size"
     )
     
+    parser.add_argument(
+        "--num-workers",
+        default=4,
+        type=int,
+        help="num workers for the inference data loader"
+    )
+    
     parser.add_argument(
         "--split",
         default=False,
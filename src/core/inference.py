@@ -7,7 +7,7 @@ from src.utils import Device
 from src.io import load_config
 from src.model import create_model
 from src.model import create_model
-from src.transform import Transform
+from src.transform import Transform, DeviceNormalize
 from torch.utils.data import DataLoader
 from src.dataset import InferenceDataset
 from typing import Dict, List, Tuple, Union
@@ -45,13 +45,15 @@ def save_output(
 
 def compute_predictions(
     model: nn.Module,
-    data_loader: DataLoader
+    data_loader: DataLoader,
+    input_transform: nn.Module = None
 ) -> Tuple[List[int], List[int], List[float]]:
     """computes predictions on dataset
 
     Args:
         model (nn.Module): model
         data_loader (DataLoader): data loader
+        input_transform (nn.Module, optional): transformation applied to images batch on device. Defaults to None.
 
     Returns:
         Tuple[List[int], List[int], List[float]]: predictions, targets, scores 
@@ -62,7 +64,9 @@ def compute_predictions(
     for i, batch in tqdm(enumerate(data_loader), total=len(data_loader)):
         with torch.no_grad():
             x, target = batch
-            x = x.to(device)
+            x = x.to(device, non_blocking=True)
+            if input_transform is not None:
+                x = input_transform(x)
             logits = model(x)
             outs = torch.nn.functional.softmax(logits, dim=1)
             max_outs, preds = torch.max(outs.data, 1)
@@ -78,15 +82,18 @@ def inference(args):
     
     class_map = config["datamodule"]["class_map"]
     num_classes = len(config["datamodule"]["class_map"])    
+    transform = Transform(train=False, **config["transform"])
     dataset = InferenceDataset(
         root_dir=args.data_dir,
         class_map=class_map if args.split else None,
-        transform=Transform(train=False, **config["transform"])
+        transform=transform
     )
     
     data_loader = DataLoader(
         dataset=dataset,
-        batch_size=args.batch_size
+        batch_size=args.batch_size,
+        num_workers=args.num_workers,
+        pin_memory=device == "cuda"
     )
     
     model = create_model(
@@ -98,9 +105,13 @@ def inference(args):
     
     model = model.to(device)
     print(f"> Starting inference on dataset {args.data_dir} (device set to {device})")
+    input_transform = None
+    if transform.device_normalize:
+        input_transform = DeviceNormalize(mean=transform.mean, std=transform.std).to(device)
     predictions, targets, scores = compute_predictions(
         model=model,
-        data_loader=data_loader
+        data_loader=data_loader,
+        input_transform=input_transform
     )
     
     # save output json
@@ -5,8 +5,9 @@ from src.io import load_config
 from src.trainer import Trainer
 from src.model import create_model
 from src.optimizer import Optimizer
-from src.transform import Transform
+from src.transform import Transform, DeviceNormalize
 from src.data import create_dataloader
+from src.dataset import DALIDataLoader
 from src.lr_scheduler import LRScheduler
 from src.utils import now, seed_everything
 from src.loss.utils import find_class_weights
@@ -23,16 +24,19 @@ def train(args):
     copy(args.config, output_dir)
     
     # setup classes for Trainer
+    train_transform = Transform(train=True, **config["transform"])
     train_dataloader = create_dataloader(
         root_dir=args.data_dir,
         train=True,
-        transform=Transform(train=True, **config["transform"]),
+        transform=train_transform,
+        cache_img_size=config["transform"]["img_size"],
         **config["data"]
     )
     val_dataloader = create_dataloader(
         root_dir=args.data_dir,
         train=False,
         transform=Transform(train=False, **config["transform"]),
+        cache_img_size=config["transform"]["img_size"],
         **config["data"]
     )
     
@@ -55,6 +59,11 @@ def train(args):
         **config["checkpoint"]
     )
     
+    # with device_normalize, uint8 batches are converted to float and normalized on device (dali already normalizes on GPU)
+    input_transform = None
+    if train_transform.device_normalize and not isinstance(train_dataloader, DALIDataLoader):
+        input_transform = DeviceNormalize(mean=train_transform.mean, std=train_transform.std)
+    
     trainer = Trainer(
         model=model,
         train_dataloader=train_dataloader,
@@ -63,6 +72,7 @@ def train(args):
         optimizer=optimizer,
         scheduler=lr_scheduler,
         model_checkpoint=model_checkpoint,
+        input_transform=input_transform,
         **config["trainer"]
     )
     
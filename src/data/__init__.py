@@ -1 +1,2 @@
-from .utils import create_dataloader
\ No newline at end of file
+from .utils import create_dataloader
+from .prefetcher import CUDAPrefetcher
\ No newline at end of file
@@ -0,0 +1,56 @@
+import torch
+from typing import Tuple
+from torch.utils.data import DataLoader
+
+class CUDAPrefetcher:
+    
+    def __init__(
+        self,
+        data_loader: DataLoader,
+        device: str = "cuda"
+    ) -> None:
+        """CUDA prefetcher: copies the next batch to the GPU on a side stream while the current batch is being processed.
+        Works best with pin_memory=True in the data loader.
+
+        Args:
+            data_loader (DataLoader): data loader to wrap
+            device (str, optional): cuda device. Defaults to "cuda".
+        """
+        self.data_loader = data_loader
+        self.device = torch.device(device)
+        self.stream = torch.cuda.Stream(device=self.device)
+        self.loader_iter = None
+        self.next_batch = None
+    
+    def _preload(self):
+        """loads next batch from data loader and starts its async copy on the side stream
+        """
+        try:
+            batch = next(self.loader_iter)
+        except StopIteration:
+            self.next_batch = None
+            return
+        
+        with torch.cuda.stream(self.stream):
+            self.next_batch = tuple(el.to(self.device, non_blocking=True) for el in batch)
+        
+    def __iter__(self) -> "CUDAPrefetcher":
+        self.loader_iter = iter(self.data_loader)
+        self._preload()
+        return self
+    
+    def __next__(self) -> Tuple[torch.Tensor, ...]:
+        if self.next_batch is None:
+            raise StopIteration
+        
+        current_stream = torch.cuda.current_stream(self.device)
+        current_stream.wait_stream(self.stream)
+        batch = self.next_batch
+        # tensors allocated on the side stream are now used by the current one
+        for el in batch:
+            el.record_stream(current_stream)
+        self._preload()
+        return batch
+    
+    def __len__(self) -> int:
+        return len(self.data_loader)
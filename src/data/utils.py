@@ -1,4 +1,8 @@
-from src.dataset import TrainDataset
+import os
+import torch
+from functools import partial
+from src.utils import seed_worker
+from src.dataset import TrainDataset, DALIDataLoader, DALI_AVAILABLE
 from torch.utils.data import DataLoader
 from src.sampler import ImbalancedSampler
 from typing import List, Dict, Union, Callable, Optional
@@ -13,11 +17,18 @@ def create_dataloader(
     transform: Callable = None, 
     imbalanced: bool = False,
     shuffle: bool = True,
-    num_workers: int = 5,
-    pin_memory: bool = True,
+    num_workers: int = None,
+    pin_memory: bool = None,
     drop_last: bool = False,
     persistent_workers: bool = True,
-) -> DataLoader:
+    prefetch_factor: int = 4,
+    pin_workers: bool = False,
+    sanity_cache: bool = True,
+    lru_size: int = 0,
+    cache_dir: str = None,
+    cache_img_size: Union[int, List[int]] = None,
+    backend: str = "pytorch",
+) -> Union[DataLoader, DALIDataLoader]:
     """Setup a dataloader for a dataset
 
     Args:
@@ -31,27 +42,64 @@ def create_dataloader(
         val_transform (Callable, optional): val data augmentation. Defaults to None.
         imbalanced (bool, optional): if dataset is imbalanced. Defaults to False.
         shuffle (bool, optional): whether to shuffle dataset. Defaults to True.
-        num_workers (int, optional): num workers. Defaults to 5.
-        pin_memory (bool, optional): data loader pin memory. Defaults to True.
+        num_workers (int, optional): num workers. If None, min(8, cpu count). Defaults to None.
+        pin_memory (bool, optional): data loader pin memory. If None, True only when cuda is available. Defaults to None.
         drop_last (bool, optional): drop last data loader. Defaults to False.
         persistent_workers (bool, optional): persistent workers data loader. Defaults to True.
+        prefetch_factor (int, optional): number of batches loaded in advance by each worker. Defaults to 4.
+        sanity_cache (bool, optional): reuse images listing of a previous sanity check if label folders did not change. Defaults to True.
+        lru_size (int, optional): per-worker LRU cache size of decoded + resized images, only for the train dataset (useful with imbalanced sampling). Defaults to 0.
+        pin_workers (bool, optional): pin each train data loader worker to a different CPU core (val workers are never pinned). Defaults to False.
+        cache_dir (str, optional): where to cache decoded images as a memory-mapped .npy file. Defaults to None.
+        cache_img_size (Union[int, List[int]], optional): image size of cached images. Defaults to None.
+        backend (str, optional): data loading backend (pytorch or dali). Falls back to pytorch if DALI is not available. Defaults to "pytorch".
 
     Returns:
-        DataLoader: dataset dataloader
+        Union[DataLoader, DALIDataLoader]: dataset dataloader
     """
     
+    assert backend in ["pytorch", "dali"], f"Backend must be one of pytorch or dali, not {backend}"
+    if backend == "dali" and not (DALI_AVAILABLE and torch.cuda.is_available()):
+        print(f"> [WARNING] backend is set to dali but nvidia-dali or cuda are not available. Setting backend to pytorch.")
+        backend = "pytorch"
+    
+    if num_workers is None:
+        num_workers = min(8, os.cpu_count() or 1)
+    
     dataset = TrainDataset(
         root_dir=root_dir,
         train=train,
         class_map=class_map,
         max_samples_per_class=max_samples_per_class if train else None,
         random_samples=random_samples if train else None,
-        transform=transform
+        transform=transform,
+        cache_dir=cache_dir if backend == "pytorch" else None,
+        cache_img_size=cache_img_size,
+        sanity_cache=sanity_cache,
+        lru_size=lru_size if train and backend == "pytorch" and cache_dir is None else 0,
+        # the first batch of each worker, only when the sampler reads the dataset in order
+        readahead=batch_size * max(1, num_workers) if backend == "pytorch" and not (shuffle or imbalanced) else 0
     )
     
+    if backend == "dali":
+        if imbalanced:
+            print(f"> [WARNING] imbalanced sampler is not supported with dali backend. Samples will be drawn uniformly.")
+        return DALIDataLoader(
+            dataset=dataset,
+            batch_size=batch_size,
+            shuffle=shuffle,
+            num_threads=num_workers,
+            drop_last=drop_last
+        )
+    if pin_memory is None:
+        pin_memory = torch.cuda.is_available()
+    
     if persistent_workers and num_workers==0:
         print(f"> [WARNING] persistent_workers is set to True and num_workers is 0 (must be >0). This is not right. Setting persistent_workers to False.")
         persistent_workers = False
+    if prefetch_factor != 2 and num_workers==0:
+        print(f"> [WARNING] prefetch_factor is set to {prefetch_factor} and num_workers is 0 (prefetching needs workers). Setting prefetch_factor to 2 (default).")
+        prefetch_factor = 2
         
     return DataLoader(
             dataset=dataset,
@@ -61,6 +109,8 @@ def create_dataloader(
             drop_last=drop_last,
             pin_memory=pin_memory,
             persistent_workers=persistent_workers,
+            prefetch_factor=prefetch_factor,
+            worker_init_fn=partial(seed_worker, pin_cores=pin_workers and train),
             sampler=ImbalancedSampler(dataset=dataset) if imbalanced else None
         )
     
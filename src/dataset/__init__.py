@@ -1 +1,2 @@
-from .dataset import TrainDataset, InferenceDataset
\ No newline at end of file
+from .dataset import TrainDataset, InferenceDataset
+from .dali_pipeline import DALIDataLoader, DALI_AVAILABLE
\ No newline at end of file
@@ -0,0 +1,77 @@
+import os
+import re
+from typing import Dict, List, Union
+from concurrent.futures import ThreadPoolExecutor
+
+EXTENSIONS = frozenset({
+    "jpg",
+    "jpeg",
+    "png",
+    "ppm",
+    "bmp",
+    "pgm",
+    "tif",
+    "tiff",
+    "webp",
+})
+_EXT_RE = re.compile(r"\.(%s)$" % "|".join(sorted(EXTENSIONS)), re.IGNORECASE)
+
+def list_images(path: str) -> List[str]:
+    """lists images in a folder with a single directory scan
+
+    Args:
+        path (str): folder to scan
+
+    Returns:
+        List[str]: images paths
+    """
+    with os.scandir(path) as it:
+        return [e.path for e in it if _EXT_RE.search(e.name)]
+
+def list_label_dirs(
+    data_dir: str,
+    class_map: Dict[int, Union[str, List[str]]]
+) -> Dict[str, List[str]]:
+    """checks label folders in class_map and lists their images (folders are scanned in parallel)
+
+    Args:
+        data_dir (str): data directory
+        class_map (Dict[int, Union[str, List[str]]]): class map {e.g. {0: 'class_a', 1: ['class_b', 'class_c']}}
+
+    Raises:
+        FileNotFoundError: if the data folder is not right based on the structure in class_map
+        FileExistsError: if some label does not have images in its folder
+
+    Returns:
+        Dict[str, List[str]]: images paths of each label
+    """
+    label_dirs: Dict[str, str] = {}
+    for k, labels in class_map.items():
+        if not isinstance(labels, list):
+            labels = [labels]
+        for l in labels:
+            label_dir =  os.path.join(data_dir, l)
+            if not (os.path.exists(label_dir)):
+                raise FileNotFoundError(f"Folder {label_dir} does not exist") 
+            label_dirs[l] = label_dir
+    
+    label_images: Dict[str, List[str]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(16, len(label_dirs)))) as pool:
+        for (l, label_dir), images in zip(label_dirs.items(), pool.map(list_images, label_dirs.values())):
+            if len(images)==0:
+                raise FileExistsError(f"Folder {label_dir} does not have images.")
+            label_images[l] = images
+    return label_images
+
+def readahead(file_path: str, length: int = 1<<20):
+    """asks the kernel to load the first bytes of a file in the page cache
+
+    Args:
+        file_path (str): file path
+        length (int, optional): bytes to read ahead. Defaults to 1<<20.
+    """
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, length, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
@@ -0,0 +1,136 @@
+import math
+import torch
+from typing import List, Tuple, Iterator
+from src.dataset.dataset import TrainDataset
+
+try:
+    from nvidia.dali import pipeline_def, fn, types
+    from nvidia.dali.plugin.pytorch import DALIClassificationIterator, LastBatchPolicy
+    DALI_AVAILABLE = True
+except ImportError:
+    DALI_AVAILABLE = False
+
+def _classification_pipeline(
+    files: List[str],
+    labels: List[int],
+    train: bool,
+    shuffle: bool,
+    img_size: Tuple[int, int],
+    mean: List[float],
+    std: List[float],
+    h_flip_p: float,
+    v_flip_p: float
+):
+    """DALI classification pipeline: file reader -> GPU decoding (nvJPEG) -> resize -> flips (train) -> normalization
+
+    Args:
+        files (List[str]): images paths
+        labels (List[int]): images targets
+        train (bool): train mode (enables flips)
+        shuffle (bool): whether to shuffle dataset
+        img_size (Tuple[int, int]): output image size (height, width)
+        mean (List[float]): normalization mean
+        std (List[float]): normalization std
+        h_flip_p (float): horizontal flip probability
+        v_flip_p (float): vertical flip probability
+
+    Returns:
+        Tuple: images (c, h, w) float32 + labels
+    """
+    jpegs, labels = fn.readers.file(
+        files=files,
+        labels=labels,
+        random_shuffle=shuffle,
+        name="Reader"
+    )
+    images = fn.decoders.image(jpegs, device="mixed", output_type=types.RGB)
+    images = fn.resize(
+        images,
+        resize_x=img_size[1],
+        resize_y=img_size[0],
+        interp_type=types.INTERP_CUBIC
+    )
+    if train:
+        images = fn.flip(
+            images,
+            horizontal=fn.random.coin_flip(probability=h_flip_p),
+            vertical=fn.random.coin_flip(probability=v_flip_p)
+        )
+    images = fn.crop_mirror_normalize(
+        images,
+        dtype=types.FLOAT,
+        output_layout="CHW",
+        mean=[m * 255 for m in mean],
+        std=[s * 255 for s in std]
+    )
+    return images, labels.gpu()
+
+class DALIDataLoader:
+    
+    def __init__(
+        self,
+        dataset: TrainDataset,
+        batch_size: int,
+        shuffle: bool = True,
+        num_threads: int = 4,
+        drop_last: bool = False,
+        device_id: int = None,
+        seed: int = -1
+    ) -> None:
+        """DALI data loader: decoding and augmentations run on GPU. It yields (x, target) batches like the PyTorch DataLoader.
+        Augmentations are limited to resize + flips (albumentations pipeline can't run on DALI).
+
+        Args:
+            dataset (TrainDataset): dataset with images and targets (its transform must be a Transform instance)
+            batch_size (int): batch size
+            shuffle (bool, optional): whether to shuffle dataset. Defaults to True.
+            num_threads (int, optional): DALI CPU threads. Defaults to 4.
+            drop_last (bool, optional): drop last batch if does not match batch size. Defaults to False.
+            device_id (int, optional): cuda device id. If None, current device. Defaults to None.
+            seed (int, optional): DALI seed (-1 for random). Defaults to -1.
+        """
+        assert DALI_AVAILABLE, "nvidia-dali is not installed"
+        
+        transform = dataset.transform
+        pipe = pipeline_def(_classification_pipeline)(
+            batch_size=batch_size,
+            num_threads=num_threads,
+            device_id=torch.cuda.current_device() if device_id is None else device_id,
+            seed=seed,
+            files=dataset.images,
+            labels=dataset.targets,
+            train=transform.train,
+            shuffle=shuffle,
+            img_size=transform.img_size,
+            mean=transform.mean,
+            std=transform.std,
+            h_flip_p=transform.h_flip_p,
+            v_flip_p=transform.v_flip_p
+        )
+        pipe.build()
+        
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.drop_last = drop_last
+        self.iterator = DALIClassificationIterator(
+            pipe,
+            reader_name="Reader",
+            last_batch_policy=LastBatchPolicy.DROP if drop_last else LastBatchPolicy.PARTIAL,
+            auto_reset=True
+        )
+        self._epoch_over = True
+        
+    def __iter__(self) -> Iterator[Tuple[torch.Tensor, torch.Tensor]]:
+        # if last epoch was interrupted (e.g. sanity check) the iterator is drained to start from scratch
+        if not self._epoch_over:
+            for _ in self.iterator:
+                pass
+        self._epoch_over = False
+        for data in self.iterator:
+            yield data[0]["data"], data[0]["label"].squeeze(-1).long()
+        self._epoch_over = True
+    
+    def __len__(self) -> int:
+        if self.drop_last:
+            return len(self.dataset) // self.batch_size
+        return math.ceil(len(self.dataset) / self.batch_size)
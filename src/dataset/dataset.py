@@ -1,24 +1,27 @@
 import os
+import cv2
+import torch
+import json
+import yaml
 import random
+import hashlib
 import numpy as np
 from PIL import Image
+from tqdm import tqdm
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from src.io import read_rgb
-from torch.utils.data import Dataset
+from src.transform import RESIZE_INTERPOLATION
+from src.dataset._utils import EXTENSIONS, list_images, list_label_dirs
+from src.dataset._utils import readahead as _readahead
+from torch.utils.data import Dataset, get_worker_info
 from typing import Callable, Dict, List, Tuple, Union
 
+SANITY_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "classifier-playground", "sanity")
+
 class TrainDataset(Dataset):
     
-    EXTENSIONS = (
-        "jpg",
-        "jpeg",
-        "png",
-        "ppm",
-        "bmp",
-        "pgm",
-        "tif",
-        "tiff",
-        "webp",
-    )
+    EXTENSIONS = EXTENSIONS
     
     def __init__(
         self,
@@ -28,6 +31,11 @@ class TrainDataset(Dataset):
         max_samples_per_class: int = None,
         random_samples: bool = False,
         transform: Callable = None,
+        cache_dir: str = None,
+        cache_img_size: Union[int, List[int]] = None,
+        sanity_cache: bool = True,
+        lru_size: int = 0,
+        readahead: int = 0,
     ) -> None:
         """Image Classification Dataset init (image folder dataset)
 
@@ -38,6 +46,11 @@ class TrainDataset(Dataset):
             max_samples_per_class (int, optional): max number of samples for each class in the dataset. Defaults to None.
             random_samples (bool, optional): if selecting randomnly the max samples per class. Defaults to False.
             transform (Callable, optional): set of data transformations. Defaults to None.
+            cache_dir (str, optional): where to cache decoded + resized images as a memory-mapped .npy file. Defaults to None.
+            cache_img_size (Union[int, List[int]], optional): image size of cached images (must be set with cache_dir or lru_size). Defaults to None.
+            sanity_cache (bool, optional): reuse images listing of a previous sanity check if label folders' mtime did not change. Disable it on filesystems with unreliable folder mtime (e.g. some NFS/FUSE mounts). Defaults to True.
+            lru_size (int, optional): number of decoded + resized images kept in a per-worker LRU cache (0 to disable). Defaults to 0.
+            readahead (int, optional): number of leading images (in dataset order) to warm up in page cache. Useful only with a sequential sampler, shuffled samplers don't read them first. Defaults to 0.
 
         Raises:
             e: if something is found erroneous in the dataset
@@ -50,22 +63,60 @@ class TrainDataset(Dataset):
         data_dir = os.path.join(root_dir, "train" if train else "val")
         # checking structure
         self.train = train
-        try:
-            self._sanity_check(
-                data_dir=data_dir, 
-                class_map=class_map
-            )
-        except Exception as e:
-            raise e
+        # on warm runs (same folders, unchanged content) the sanity check is skipped and the images listing is reused
+        signature = self._signature(
+            data_dir=data_dir,
+            class_map=class_map
+        ) if sanity_cache else None
+        sanity_path = os.path.join(SANITY_CACHE_DIR, f"{signature}.json") if signature is not None else None
+        if sanity_path is not None and os.path.exists(sanity_path):
+            with open(sanity_path, "r") as f:
+                self._label_images = json.load(f)
+            print(f"> {'Train' if self.train else 'Val/Test'} dataset sanity check OK (cached)")
+        else:
+            try:
+                self._sanity_check(
+                    data_dir=data_dir, 
+                    class_map=class_map
+                )
+            except Exception as e:
+                raise e
+            if sanity_path is not None:
+                self._save_sanity_cache(sanity_path)
         self.data_dir = data_dir
         self.class_map = class_map
         self.images, self.targets = self._load_samples(
             max_samples_per_class=max_samples_per_class,
             random_samples=random_samples
         )
+        if readahead > 0 and cache_dir is None:
+            self._warm_page_cache(self.images[:readahead])
+        self._targets_np = np.asarray(self.targets, dtype=np.int64)
+        self.targets_tensor = torch.as_tensor(self._targets_np, dtype=torch.long)
+        self.class_counts = torch.bincount(self.targets_tensor, minlength=len(class_map))
         self.transform = transform
         self.stats()
         
+        # per-worker LRU of decoded images resized to cache_img_size (bounded memory per entry)
+        self._lru_capacity = lru_size
+        self._lru: OrderedDict = None
+        self._lru_worker = None
+        if self._lru_capacity > 0:
+            assert cache_img_size is not None, "cache_img_size must be set when lru_size > 0"
+            if isinstance(cache_img_size, (list, tuple)):
+                self._lru_img_size = (cache_img_size[0], cache_img_size[1])
+            else:
+                self._lru_img_size = (cache_img_size, cache_img_size)
+        
+        self.mmap = None
+        self.cache_path = None
+        if cache_dir is not None:
+            assert cache_img_size is not None, "cache_img_size must be set when cache_dir is set"
+            self.cache_path = self._build_mmap_cache(
+                cache_dir=os.path.join(cache_dir, "train" if train else "val"),
+                img_size=cache_img_size
+            )
+        
     def _sanity_check(
         self,
         data_dir: str,
@@ -82,17 +133,58 @@ class TrainDataset(Dataset):
             FileExistsError: if some label does not have images in its folder
 
         """
-        for k, labels in class_map.items():
+        # images of each label dir are listed once here and reused by _load_samples
+        self._label_images = list_label_dirs(
+            data_dir=data_dir,
+            class_map=class_map
+        )
+                
+        print(f"> {'Train' if self.train else 'Val/Test'} dataset sanity check OK")
+    
+    def _signature(
+        self,
+        data_dir: str,
+        class_map: Dict[int, Union[str, List[str]]]
+    ) -> str:
+        """computes dataset signature from data dir, class map and label folders' mtime
+        (a folder mtime changes when files are added, removed or renamed, but it may not be updated on some NFS/FUSE mounts).
+        Both raw and absolute data dir are hashed since cached images paths are relative if data dir is relative.
+
+        Args:
+            data_dir (str): data directory
+            class_map (Dict[int, Union[str, List[str]]]): class map
+
+        Returns:
+            str: signature (None if some label folder does not exist)
+        """
+        mtimes = {}
+        for labels in class_map.values():
             if not isinstance(labels, list):
                 labels = [labels]
             for l in labels:
-                label_dir =  os.path.join(data_dir, l)
-                if not (os.path.exists(label_dir)):
-                    raise FileNotFoundError(f"Folder {label_dir} does not exist") 
-                if len(os.listdir(label_dir))==0:
-                    raise FileExistsError(f"Folder {label_dir} is empty.")
-                
-        print(f"> {'Train' if self.train else 'Val/Test'} dataset sanity check OK")
+                try:
+                    mtimes[l] = os.path.getmtime(os.path.join(data_dir, l))
+                except OSError:
+                    return None
+        
+        return hashlib.sha1(
+            json.dumps({"root": os.path.abspath(data_dir), "data_dir": data_dir, "cm": class_map, "mtimes": mtimes}, sort_keys=True).encode()
+        ).hexdigest()
+    
+    def _save_sanity_cache(self, sanity_path: str):
+        """saves images listing of a successful sanity check
+
+        Args:
+            sanity_path (str): path to sanity cache file
+        """
+        try:
+            os.makedirs(os.path.dirname(sanity_path), exist_ok=True)
+            tmp_path = f"{sanity_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._label_images, f)
+            os.replace(tmp_path, sanity_path)
+        except OSError as e:
+            print(f"> [WARNING] Could not save sanity check cache at {sanity_path}. Error {e}.")
     
     def _load_samples(
         self, 
@@ -115,8 +207,7 @@ class TrainDataset(Dataset):
                 labels = [labels]
             c_images, c_targets = [], []
             for label in labels:
-                label_dir = os.path.join(self.data_dir, label)
-                c_images += [os.path.join(label_dir, f) for f in os.listdir(label_dir) if f.split(".")[-1].lower() in self.EXTENSIONS]
+                c_images += self._label_images[label]
             if max_samples_per_class is not None:
                 if len(c_images) > max_samples_per_class:
                     print(f"> Images will be limited from {len(c_images)} to {max_samples_per_class} {'(selected randomnly) ' if random_samples else ''}for label {c} ({self.class_map[c]})")
@@ -131,10 +222,24 @@ class TrainDataset(Dataset):
         
         return paths, targets
     
+    def _warm_page_cache(self, paths: List[str]):
+        """warms up page cache with the given images, so that the first reads of data loader workers hit RAM instead of disk.
+        fadvise is asynchronous: the pool only waits for open/fadvise calls, not for the reads.
+
+        Args:
+            paths (List[str]): images to read ahead
+        """
+        if not hasattr(os, "posix_fadvise"):
+            return
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for p in paths:
+                pool.submit(_readahead, p)
+    
     def stats(self):
         """prints stats of the dataset
         """
-        unique, counts = np.unique(self.targets, return_counts=True)
+        counts = self.class_counts.numpy()
+        unique = np.arange(len(counts))
         num_samples = len(self.targets)
         print(f" ----------- Dataset {'Train' if self.train else 'Val/Test'} Stats -----------")
         for k in range(len(unique)):
@@ -144,12 +249,113 @@ class TrainDataset(Dataset):
             print(f"> {classes} : {counts[k]}/{num_samples} -> {100 * counts[k] / num_samples:.3f}%")
         print(f" -------------------------------------")
     
+    @property
+    def class_weights(self) -> torch.Tensor:
+        """returns the weight of each class (inverse of number of samples)
+
+        Returns:
+            torch.Tensor: class weights
+        """
+        return 1.0 / self.class_counts.float()
+    
+    def _build_mmap_cache(
+        self,
+        cache_dir: str,
+        img_size: Union[int, List[int]]
+    ) -> str:
+        """decodes and resizes all images once and stores them in a memory-mapped .npy file (N, H, W, 3) uint8.
+        The cache is built only if metadata.yaml in cache_dir does not match the current dataset.
+
+        Args:
+            cache_dir (str): cache directory
+            img_size (Union[int, List[int]]): cached images size
+
+        Returns:
+            str: path to .npy cache file
+        """
+        if isinstance(img_size, (list, tuple)):
+            height, width = img_size[0], img_size[1]
+        else:
+            height, width = img_size, img_size
+        
+        cache_path = os.path.join(cache_dir, "images.npy")
+        metadata_path = os.path.join(cache_dir, "metadata.yaml")
+        metadata = {
+            "length": len(self.images),
+            "shape": [len(self.images), height, width, 3],
+            "interpolation": int(RESIZE_INTERPOLATION),
+            "images_hash": hashlib.sha1("\n".join(self.images).encode()).hexdigest()
+        }
+        
+        if os.path.exists(cache_path) and os.path.exists(metadata_path):
+            with open(metadata_path, "r") as f:
+                if yaml.safe_load(f) == metadata:
+                    print(f"> Using cached images at {cache_path}")
+                    return cache_path
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(metadata_path):
+            os.remove(metadata_path)
+        mmap = np.lib.format.open_memmap(
+            cache_path,
+            mode="w+",
+            dtype=np.uint8,
+            shape=tuple(metadata["shape"])
+        )
+        for i, img_path in tqdm(enumerate(self.images), total=len(self.images), desc="Caching images"):
+            img = np.asarray(read_rgb(img_path))
+            mmap[i] = cv2.resize(img, (width, height), interpolation=RESIZE_INTERPOLATION)
+        mmap.flush()
+        del mmap
+        
+        with open(metadata_path, "w") as f:
+            yaml.safe_dump(metadata, f)
+        print(f"> Cached {len(self.images)} images at {cache_path}")
+        
+        return cache_path
+    
+    def _read_cached(self, index: int) -> Union[Image.Image, np.ndarray]:
+        """reads image through a LRU cache of decoded images resized to cache_img_size with RESIZE_INTERPOLATION (pre-augmentation,
+        the train/val transforms start with the same resize). Each data loader worker has its own copy of the dataset, hence its own cache.
+
+        Args:
+            index (int): image index
+
+        Returns:
+            Union[Image.Image, np.ndarray]: decoded image
+        """
+        if self._lru_capacity <= 0:
+            return read_rgb(self.images[index])
+        
+        worker_info = get_worker_info()
+        worker_id = worker_info.id if worker_info is not None else None
+        if self._lru is None or self._lru_worker != worker_id:
+            self._lru = OrderedDict()
+            self._lru_worker = worker_id
+        
+        if index in self._lru:
+            self._lru.move_to_end(index)
+            img = self._lru[index]
+        else:
+            height, width = self._lru_img_size
+            img = cv2.resize(np.asarray(read_rgb(self.images[index])), (width, height), interpolation=RESIZE_INTERPOLATION)
+            self._lru[index] = img
+            if len(self._lru) > self._lru_capacity:
+                self._lru.popitem(last=False)
+        # augmentations must not modify the cached image
+        return img.copy()
+    
     def __getitem__(self, index) -> Tuple:
         
-        img_path = self.images[index]
         target = self.targets[index]
         
-        img = read_rgb(img_path)
+        if self.cache_path is not None:
+            # opened lazily so that each data loader worker maps the file on its own
+            if self.mmap is None:
+                self.mmap = np.load(self.cache_path, mmap_mode="r")
+            img = np.array(self.mmap[index])
+        else:
+            img = self._read_cached(index)
         
         if self.transform is not None:
             img = self.transform(img)
@@ -161,17 +367,7 @@ class TrainDataset(Dataset):
     
 class InferenceDataset(Dataset):
     
-    EXTENSIONS = (
-        "jpg",
-        "jpeg",
-        "png",
-        "ppm",
-        "bmp",
-        "pgm",
-        "tif",
-        "tiff",
-        "webp",
-    )
+    EXTENSIONS = EXTENSIONS
     
     def __init__(
         self,
@@ -221,22 +417,19 @@ class InferenceDataset(Dataset):
             FileExistsError: if some label does not have images in its folder
 
         """
+        # images of each folder are listed once here and reused by _load_samples
         if class_map is None:
             if not (os.path.exists(root_dir)):
                     raise FileNotFoundError(f"Folder {root_dir} does not exist") 
-            images = [f for f in os.listdir(root_dir) if f.split(".")[-1].lower() in self.EXTENSIONS]
+            images = list_images(root_dir)
             if len(images) == 0:
                 raise FileExistsError(f"Folder {root_dir} does not have images.")
+            self._label_images = {root_dir: images}
         else:
-            for k, labels in class_map.items():
-                if not isinstance(labels, list):
-                    labels = [labels]
-                for l in labels:
-                    label_dir =  os.path.join(root_dir, l)
-                    if not (os.path.exists(label_dir)):
-                        raise FileNotFoundError(f"Folder {label_dir} does not exist") 
-                    if len(os.listdir(label_dir))==0:
-                        raise FileExistsError(f"Folder {label_dir} is empty.")
+            self._label_images = list_label_dirs(
+                data_dir=root_dir,
+                class_map=class_map
+            )
                 
         print(f"> Inference dataset sanity check OK")
     
@@ -248,7 +441,7 @@ class InferenceDataset(Dataset):
         """
         
         if self.class_map is None:
-            paths = [os.path.join(self.data_dir, f) for f in os.listdir(self.data_dir) if f.split(".")[-1].lower() in self.EXTENSIONS]
+            paths = self._label_images[self.data_dir]
             targets = [-1]*len(paths)
         else:
             paths, targets = [], []
@@ -257,8 +450,7 @@ class InferenceDataset(Dataset):
                     labels = [labels]
                 c_images, c_targets = [], []
                 for label in labels:
-                    label_dir = os.path.join(self.data_dir, label)
-                    c_images += [os.path.join(label_dir, f) for f in os.listdir(label_dir) if f.split(".")[-1].lower() in self.EXTENSIONS]
+                    c_images += self._label_images[label]
                 c_targets += [c] * len(c_images)
                 paths += c_images
                 targets += c_targets
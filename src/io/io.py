@@ -2,7 +2,14 @@ import os
 import yaml
 import numpy as np
 from PIL import Image
-from typing import Dict
+from typing import Dict, Union
+
+# accimage (torchvision's optional SIMD-accelerated decoder) is used when installed,
+# otherwise decoding falls back to PIL (install pillow-simd for a faster drop-in PIL)
+try:
+    import accimage
+except ImportError:
+    accimage = None
 
 def load_config(path: str) -> Dict:
     """loads a single yml file
@@ -35,10 +42,58 @@ def read_gray(file_path: str) -> Image:
     image = Image.open(file_path).convert("L")
     return image
 
-def read_rgb(file_path: str) -> Image:
+def _read_rgb_accimage(file_path: str) -> np.ndarray:
+    """decodes an image with accimage (libjpeg-turbo + Intel IPP)
+
+    Args:
+        file_path (str): path to image
+
+    Returns:
+        np.ndarray: RGB image (h, w, c) uint8
+    """
+    image = accimage.Image(file_path)
+    # copyto writes raw [0, 255] pixels into uint8 buffers (float buffers get [0, 1] values)
+    buffer = np.zeros((image.channels, image.height, image.width), dtype=np.uint8)
+    image.copyto(buffer)
+    return buffer.transpose(1, 2, 0)
+
+def _accimage_matches_pil(file_path: str, atol: float = 2.) -> bool:
+    """checks that accimage and PIL decode the same image (up to small IDCT differences)
+
+    Args:
+        file_path (str): path to a JPEG image
+        atol (float, optional): max mean absolute difference between the two decodings. Defaults to 2..
+
+    Returns:
+        bool: True if accimage decoding matches PIL
+    """
+    acc_image = _read_rgb_accimage(file_path)
+    pil_image = np.asarray(Image.open(file_path).convert("RGB"))
+    if acc_image.shape != pil_image.shape or acc_image.dtype != pil_image.dtype:
+        return False
+    return np.abs(acc_image.astype(np.float32) - pil_image.astype(np.float32)).mean() <= atol
+
+# accimage decoding is checked against PIL on the first JPEG read by each process
+_accimage_checked = False
+
+def read_rgb(file_path: str) -> Union[Image.Image, np.ndarray]:
+    global accimage, _accimage_checked
     if not os.path.exists(file_path):
         raise ValueError(f"The path {file_path} does not exist")
 
+    if accimage is not None:
+        try:
+            if not _accimage_checked:
+                _accimage_checked = True
+                if not _accimage_matches_pil(file_path):
+                    print(f"> [WARNING] accimage decoding of {file_path} does not match PIL. Falling back to PIL.")
+                    accimage = None
+                    return Image.open(file_path).convert("RGB")
+            return _read_rgb_accimage(file_path)
+        except OSError:
+            # accimage supports only JPEG files, other formats are decoded with PIL
+            # (the check is repeated on the next file)
+            _accimage_checked = False
+
     image = Image.open(file_path).convert("RGB")
     return image
-    
\ No newline at end of file
@@ -25,16 +25,16 @@ class ImbalancedSampler(Sampler):
         # if indices is not provided, all elements in the dataset will be considered
         self.indices = list(range(len(dataset))) if indices is None else indices
         self.num_samples = len(self.indices) if num_samples is None else num_samples
-        # distribution of classes in the dataset
-        label_count = {}
-        for idx in self.indices:
-            label = dataset.targets[idx]
-            if label in label_count: label_count[label] += 1
-            else: label_count[label] = 1
+        # distribution of classes in the dataset (precomputed by the dataset when all elements are considered)
+        if indices is None:
+            targets = dataset.targets_tensor
+            class_counts = dataset.class_counts
+        else:
+            targets = dataset.targets_tensor[torch.as_tensor(self.indices, dtype=torch.long)]
+            class_counts = torch.bincount(targets, minlength=len(dataset.class_counts))
 
         # weight for each sample
-        weights = [1.0 / label_count[dataset.targets[idx]] for idx in self.indices]
-        self.weights = torch.DoubleTensor(weights)
+        self.weights = (1.0 / class_counts.double())[targets]
         
     def __iter__(self) -> Iterator:
         return (
@@ -5,6 +5,7 @@ from src.utils import Device
 from torch.optim import Optimizer
 from src.optimizer.sam import SAM
 from src.utils import ModelCheckpoint
+from src.data import CUDAPrefetcher
 from typing import Tuple, Dict, Union
 from torch.utils.data import DataLoader
 from src.utils import timeit, TimeMonitor
@@ -29,6 +30,14 @@ class Trainer:
         gradient_clip_val: Union[int, float] = None,
         gradient_clip_algorithm: str = "norm",
         device: str = "mps",
+        memory_format: str = None,
+        amp: bool = False,
+        amp_dtype: str = None,
+        input_transform: nn.Module = None,
+        cudnn_benchmark: bool = False,
+        tf32: bool = False,
+        compile: bool = False,
+        compile_mode: str = "max-autotune",
     ) -> None:
         """Trainer
 
@@ -43,10 +52,21 @@ class Trainer:
             model_checkpoint (ModelCheckpoint): model checkpoint class instance
             check_val_every_n_epoch (int, optional): how often running validation. Defaults to 1.
             device (str, optional): device. Defaults to "mps".
+            memory_format (str, optional): model and input memory format (channels_last or contiguous_format). If None, channels_last with cuda, contiguous_format otherwise. Defaults to None.
+            amp (bool, optional): automatic mixed precision (only with cuda). Defaults to False.
+            amp_dtype (str, optional): mixed precision dtype (fp16 or bf16). If None, bf16 when supported by the GPU, fp16 otherwise. Defaults to None.
+            input_transform (nn.Module, optional): transformation applied to images batch on device (e.g. DeviceNormalize). Defaults to None.
+            cudnn_benchmark (bool, optional): lets cuDNN pick the fastest convolution algorithms with cuda. It overrides seed_everything's cudnn.benchmark=False, so runs are no longer reproducible. Defaults to False.
+            tf32 (bool, optional): runs float32 matmuls in TF32 on Ampere+ GPUs (changes numerics). Defaults to False.
+            compile (bool, optional): compiles the model with torch.compile (torch>=2.0). Defaults to False.
+            compile_mode (str, optional): torch.compile mode. Defaults to "max-autotune".
         """
         
         assert device in ["mps", "cuda"], "Device must be either mps or cuda, not {device}."
         assert gradient_clip_algorithm in ["val", "norm"], "Gradient clip algorithm must be one of val or norm, not {gradient_clip_algorithm}"
+        if memory_format is None:
+            memory_format = "channels_last" if device == "cuda" else "contiguous_format"
+        assert memory_format in ["channels_last", "contiguous_format"], f"Memory format must be one of channels_last or contiguous_format, not {memory_format}"
         
         self.model = model
         self.train_dataloader = train_dataloader
@@ -58,9 +78,15 @@ class Trainer:
         self.check_val_every_n_epoch = check_val_every_n_epoch
         self.check_train_every_n_iter = check_train_every_n_iter
         self.device = device
+        self.memory_format = getattr(torch, memory_format)
         self.model_checkpoint = model_checkpoint
+        self.input_transform = input_transform
         self.epoch_val_metrics = None
         
+        # with cuda the next train batch is copied to GPU while the current one is processed (DALI batches are already on GPU)
+        self.train_batches = CUDAPrefetcher(self.train_dataloader, self.device) \
+            if self.device == "cuda" and isinstance(self.train_dataloader, DataLoader) else self.train_dataloader
+        
         # Gradient clip
         self.gradient_clip_algorithm = torch.nn.utils.clip_grad.clip_grad_norm_ if gradient_clip_algorithm=="norm" \
             else torch.nn.utils.clip_grad.clip_grad_value_
@@ -73,6 +99,19 @@ class Trainer:
         else:
             self.with_sam = False
             self.bn_to_zero = False
+        
+        # [AMP] autocast + GradScaler (scaler is needed only with fp16)
+        self.amp = amp and self.device == "cuda"
+        if amp and not self.amp:
+            print(f"> [WARNING] amp is supported only with cuda device, not {self.device}. Setting amp to False.")
+        if amp_dtype is None:
+            amp_dtype = "bf16" if self.amp and torch.cuda.is_bf16_supported() else "fp16"
+        assert amp_dtype in ["fp16", "bf16"], f"AMP dtype must be one of fp16 or bf16, not {amp_dtype}"
+        self.amp_dtype = torch.bfloat16 if amp_dtype == "bf16" else torch.float16
+        if self.amp and self.with_sam and self.amp_dtype == torch.float16:
+            print(f"> [WARNING] SAM optimizer does not support fp16 gradient scaling. Use amp_dtype bf16 instead. Setting amp to False.")
+            self.amp = False
+        self.scaler = torch.cuda.amp.GradScaler(enabled=self.amp and self.amp_dtype == torch.float16)
                 
         self.metrics = {
             "acc": Accuracy().to(self.device),
@@ -82,8 +121,44 @@ class Trainer:
             "cal_err": CalibrationError().to(self.device)
         }
         
-        self.model.to(self.device)
+        self.model.to(self.device, memory_format=self.memory_format)
         self.criterion.to(self.device)
+        if self.input_transform is not None:
+            self.input_transform.to(self.device)
+        
+        # [cuDNN] input shapes are fixed, so the algorithm search runs only once
+        if self.device == "cuda" and cudnn_benchmark:
+            torch.backends.cudnn.benchmark = True
+        
+        if self.device == "cuda" and tf32:
+            torch.set_float32_matmul_precision("high")
+        
+        # [torch.compile] kernel fusion with Inductor
+        if compile:
+            if hasattr(torch, "compile"):
+                print(f"> Compiling model with torch.compile (mode={compile_mode}).")
+                self.model = torch.compile(self.model, mode=compile_mode)
+            else:
+                print(f"> [WARNING] torch.compile requires torch>=2.0 (found {torch.__version__}). Model will not be compiled.")
+    
+    def _to_device(
+        self,
+        batch: Tuple
+    ) -> Tuple:
+        """moves batch to device with images in the model memory format (+ input transform if set)
+
+        Args:
+            batch (Tuple): batch from dataloader
+
+        Returns:
+            Tuple: batch on device
+        """
+        x, target = batch
+        x = x.to(self.device, non_blocking=True, memory_format=self.memory_format)
+        if self.input_transform is not None:
+            x = self.input_transform(x)
+        target = target.to(self.device, non_blocking=True)
+        return x, target
         
     @timeit
     def training_step(
@@ -105,17 +180,20 @@ class Trainer:
         
         if not self.with_sam:
             self.optimizer.zero_grad()
-            logits = self.model(x)
-            loss = self.criterion(logits, target)
+            with torch.autocast(device_type="cuda", dtype=self.amp_dtype, enabled=self.amp):
+                logits = self.model(x)
+                loss = self.criterion(logits, target)
             if self.gradient_clip_val is not None: self.gradient_clip_algorithm(self.model.parameters(), self.gradient_clip_val)
-            loss.backward()
-            self.optimizer.step()
+            self.scaler.scale(loss).backward()
+            self.scaler.step(self.optimizer)
+            self.scaler.update()
         else:
             # First SAM step
             if self.bn_to_zero:
                 enable_running_stats(self.model)
-            logits = self.model(x)
-            loss = self.criterion(logits, target)
+            with torch.autocast(device_type="cuda", dtype=self.amp_dtype, enabled=self.amp):
+                logits = self.model(x)
+                loss = self.criterion(logits, target)
             if self.gradient_clip_val is not None: self.gradient_clip_algorithm(self.model.parameters(), self.gradient_clip_val)
             loss.mean().backward()
             self.optimizer.first_step(zero_grad=True)
@@ -123,8 +201,9 @@ class Trainer:
             # Second SAM step
             if self.bn_to_zero:
                 disable_running_stats(self.model)
-            logits_2 = self.model(x)
-            loss_2 = self.criterion(logits_2, target)
+            with torch.autocast(device_type="cuda", dtype=self.amp_dtype, enabled=self.amp):
+                logits_2 = self.model(x)
+                loss_2 = self.criterion(logits_2, target)
             if self.gradient_clip_val is not None: self.gradient_clip_algorithm(self.model.parameters(), self.gradient_clip_val)
             loss_2.mean().backward()
             self.optimizer.second_step(zero_grad=True)
@@ -150,10 +229,10 @@ class Trainer:
         self.model.train()
         
         train_loss = 0
-        for batch_idx, batch in enumerate(self.train_dataloader, 0):
+        for batch_idx, batch in enumerate(self.train_batches, 0):
             # training step
             step_loss, t_step = self.training_step(
-                batch=(el.to(self.device) for el in batch),
+                batch=self._to_device(batch),
                 batch_idx=batch_idx
             )
             train_loss += step_loss
@@ -199,14 +278,15 @@ class Trainer:
         """
         
         x, target = batch
-        logits = self.model(x)
-        loss = self.criterion(logits, target)
+        with torch.autocast(device_type="cuda", dtype=self.amp_dtype, enabled=self.amp):
+            logits = self.model(x)
+            loss = self.criterion(logits, target)
         
         if sanity: return loss.item()
         
         for m in self.metrics:
             self.metrics[m].update(
-                preds=torch.softmax(logits, dim=1),
+                preds=torch.softmax(logits.float(), dim=1),
                 target=target
             )
         return loss.item()
@@ -230,7 +310,7 @@ class Trainer:
         for batch_idx, batch in tqdm(enumerate(self.val_dataloader, 0), total=len(self.val_dataloader)):
             # validation step
             step_loss, t_step = self.validation_step(
-                batch=(el.to(self.device) for el in batch),
+                batch=self._to_device(batch),
                 batch_idx=batch_idx
             )
             val_loss += step_loss
@@ -256,7 +336,7 @@ class Trainer:
             for batch_idx, batch in tqdm(enumerate(self.val_dataloader, 0), total=2, desc="Sanity Check"):
                 # validation step
                 _, _ = self.validation_step(
-                    batch=(el.to(self.device) for el in batch),
+                    batch=self._to_device(batch),
                     batch_idx=batch_idx,
                     sanity=True
                 )
@@ -284,10 +364,11 @@ class Trainer:
                 self.model_checkpoint.step(
                     epoch=epoch,
                     metrics=self.epoch_val_metrics,
-                    state_dict=self.model.state_dict()
+                    state_dict=getattr(self.model, "_orig_mod", self.model).state_dict()
                 )
                 if self.model_checkpoint.patience_over:
                     print(f"> Patience over at epoch {epoch}. Ending training.")
                     print("-"*80)
                     break
+        self.model_checkpoint.wait()
         print(f"> Training over {epoch+1} epochs.")
\ No newline at end of file
@@ -1 +1,2 @@
-from .transform import Transform
\ No newline at end of file
+from .transform import Transform, RESIZE_INTERPOLATION
+from .normalize import DeviceNormalize
\ No newline at end of file
@@ -0,0 +1,33 @@
+import torch
+import torch.nn as nn
+from typing import List
+
+class DeviceNormalize(nn.Module):
+    
+    def __init__(
+        self,
+        mean: List[float] = [0.485, 0.456, 0.406],
+        std: List[float] = [0.229, 0.224, 0.225],
+        max_pixel_value: float = 255.0
+    ) -> None:
+        """Normalizes uint8 images batch on device (same as albumentations Normalize, but after the H2D copy)
+
+        Args:
+            mean (List[float], optional): normalization mean. Defaults to [0.485, 0.456, 0.406].
+            std (List[float], optional): normalization std. Defaults to [0.229, 0.224, 0.225].
+            max_pixel_value (float, optional): max pixel value. Defaults to 255.0.
+        """
+        super().__init__()
+        self.register_buffer("mean", torch.tensor(mean).view(1, -1, 1, 1) * max_pixel_value)
+        self.register_buffer("std", torch.tensor(std).view(1, -1, 1, 1) * max_pixel_value)
+        
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """normalizes batch
+
+        Args:
+            x (torch.Tensor): uint8 images batch (b, c, h, w)
+
+        Returns:
+            torch.Tensor: float32 normalized batch
+        """
+        return x.to(torch.float32).sub_(self.mean).div_(self.std)
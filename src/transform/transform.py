@@ -5,6 +5,10 @@ import albumentations as A
 from src.utils import to_tensor
 from typing import Union, Tuple, List
 
+# albumentations forwards the interpolation flag to cv2.resize, where PIL's BICUBIC (3) is cv2.INTER_AREA.
+# Every resize outside the transforms (e.g. image caches) must use this same flag.
+RESIZE_INTERPOLATION = Image.BICUBIC
+
 #TODO: add augmix
 class Transform:
     
@@ -41,6 +45,7 @@ class Transform:
         hsv_hue_shift_limit: int = 10,
         hsv_val_shift_limit: int = 10,
         hsv_p: float = .5,  
+        device_normalize: bool = False,
     ):
         """Classifer Transform
 
@@ -76,12 +81,21 @@ class Transform:
             hsv_hue_shift_limit (int, optional): HueSaturationValue hue limit. Defaults to 10.
             hsv_val_shift_limit (int, optional): HueSaturationValue value limit. Defaults to 10.
             hsv_p (float, optional): HueSaturationValue transformation probability. Defaults to .5.
+            device_normalize (bool, optional): if True, normalization is skipped and images are returned as uint8 (c, h, w) to be normalized on device (see DeviceNormalize). Defaults to False.
         """
         
         if isinstance(img_size, tuple) or isinstance(img_size, list):
             height, width = img_size[0], img_size[1]
         else:
             height, width = img_size, img_size
+        
+        self.train = train
+        self.img_size = (height, width)
+        self.mean = mean
+        self.std = std
+        self.h_flip_p = h_flip_p
+        self.v_flip_p = v_flip_p
+        self.device_normalize = device_normalize
             
         if train:
             self.transform = A.Compose([
@@ -89,7 +103,7 @@ class Transform:
                     height=height, 
                     width=width, 
                     always_apply=True,
-                    interpolation=Image.BICUBIC
+                    interpolation=RESIZE_INTERPOLATION
                 ),
                 # Flip and ColorJitter
                 A.HorizontalFlip(p=h_flip_p),
@@ -153,23 +167,23 @@ class Transform:
                 A.Resize(
                     height=height, 
                     width=width, 
-                    interpolation=Image.BICUBIC,
+                    interpolation=RESIZE_INTERPOLATION,
                     always_apply=True
                 ),
                 # Normalization
                 A.Normalize(
                     mean=mean, 
                     std=std
-                )            
+                ) if not device_normalize else A.NoOp()
             ])
         else:
             self.transform = A.Compose([
                 A.Resize(
                     height=height, 
                     width=width, 
-                    interpolation=Image.BICUBIC
+                    interpolation=RESIZE_INTERPOLATION
                 ),
-                A.Normalize(mean=mean, std=std),
+                A.Normalize(mean=mean, std=std) if not device_normalize else A.NoOp(),
             ])
             
     def __call__(
@@ -189,6 +203,10 @@ class Transform:
             img = np.array(img)
         
         img = self.transform(image=img)['image']
-        img = to_tensor(img)
+        if self.device_normalize:
+            # uint8 (c, h, w): conversion to float + normalization happen on device
+            img = np.ascontiguousarray(img.transpose(2, 0, 1))
+        else:
+            img = to_tensor(img)
         
         return img
\ No newline at end of file
@@ -1,5 +1,5 @@
 from .time import now, timeit, TimeMonitor
 from .model_checkpoint import ModelCheckpoint
 from .type import to_tensor
-from .seed import seed_everything
+from .seed import seed_everything, seed_worker
 from .device import device as Device
\ No newline at end of file
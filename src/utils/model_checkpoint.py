@@ -1,6 +1,9 @@
 import os
+import heapq
 import torch
+import atexit
 from typing import Dict, List, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
 
 class ModelCheckpoint:
     
@@ -25,17 +28,27 @@ class ModelCheckpoint:
         
         assert mode in ["max", "min"], f"Mode {mode} not supported. Choose between max or min."
         self.output_dir = os.path.join(output_dir, "checkpoints")
-        os.makedirs(self.output_dir)
+        os.makedirs(self.output_dir, exist_ok=True)
         self.monitor = monitor
-        self.history: List[Tuple[int, int]] = [] # each el is a Tuple of (val, epoch)
         self.save_top_k = save_top_k
         self.mode = mode
-        self.reverse = True if self.mode == "max" else False
         self.patience = patience
         
+        # bounded min-heap of (sign*val, -epoch): the root is always the worst model kept
+        # (among tied worst values, the most recent epoch is evicted first)
+        self._heap: List[Tuple[float, int]] = []
+        self._sign = 1 if self.mode == "max" else -1
+        self._best = None
+        
         # support fields
         self.patience_count = 0
         self.to_remove = None # an epoch will be saved here
+        self._epoch_to_path: Dict[int, str] = {} # pth file path of each saved epoch
+        
+        # pth files are written on a background thread to not stall training
+        self._io_pool = ThreadPoolExecutor(max_workers=1)
+        self._pending: Future = None
+        atexit.register(self._io_pool.shutdown, wait=True)
     
     def _update_history_sequence(
         self,
@@ -52,12 +65,23 @@ class ModelCheckpoint:
         """
 
         if remove_last:
-            self.to_remove = self.history[-1][1]
-            self.history = self.history[:-1]
-            
-        self.history.append((val, epoch))
-        self.history = sorted(self.history, reverse=self.reverse, key=lambda x: x[0])
+            _, neg_epoch = heapq.heapreplace(self._heap, (self._sign*val, -epoch))
+            self.to_remove = -neg_epoch
+        else:
+            heapq.heappush(self._heap, (self._sign*val, -epoch))
+        
+        if self._best is None or self._sign*val > self._sign*self._best:
+            self._best = val
         self.patience_count = 0
+    
+    @property
+    def history(self) -> List[Tuple[float, int]]:
+        """returns history sequence sorted from best to worst
+
+        Returns:
+            List[Tuple[float, int]]: list of (val, epoch)
+        """
+        return [(self._sign*v, -e) for v, e in sorted(self._heap, reverse=True)]
       
     @property  
     def best_val(self) -> float:
@@ -66,9 +90,7 @@ class ModelCheckpoint:
         Returns:
             float: best value
         """
-        if len(self.history) == 0: 
-            return None
-        return sorted(self.history, reverse=self.reverse, key=lambda x: x[0])[0][0]
+        return self._best
     
     def _update_history(
         self,
@@ -82,7 +104,7 @@ class ModelCheckpoint:
             epoch (int): epoch to evaluate
         """
         
-        if len(self.history) < self.save_top_k:
+        if len(self._heap) < self.save_top_k:
             self._update_history_sequence(
                 val=val,
                 epoch=epoch,
@@ -90,12 +112,8 @@ class ModelCheckpoint:
             )
             print(f"Epoch {epoch} with best model with {self.monitor}={val:.4f}. Best model is at {self.monitor}={self.best_val:.4f}")
         else:
-            # checking for history full
-            to_update = True
-            if self.mode == "max" and val<min(self.history, key=lambda x: x[0])[0]:
-                to_update = False
-            elif self.mode == "min" and val>max(self.history, key=lambda x: x[0])[0]:
-                to_update = False
+            # checking for history full (heap root is the worst value kept)
+            to_update = self._sign*val >= self._heap[0][0]
             
             if not to_update:
                 print(f"Epoch {epoch} was not between best models with {self.monitor}={val:.4f}. Current best model interval is {self.monitor}={self.best_val:.4f}")
@@ -140,6 +158,35 @@ class ModelCheckpoint:
                 sep = "-"
             base_filename += f"{k}={metrics[k]:.4f}{sep}"
         return f"{base_filename}.pth"
+    
+    def _write(
+        self,
+        state_dict: Dict,
+        pth_path: str
+    ):
+        """writes state dict to pth file (runs on the background thread)
+
+        Args:
+            state_dict (Dict): state dict (on cpu)
+            pth_path (str): pth file path
+        """
+        try:
+            # large write buffer to limit the number of small writes while the zip is streamed to disk
+            with open(pth_path, "wb", buffering=16<<20) as f:
+                torch.save(
+                    state_dict,
+                    f
+                )
+            print(f"Saved model pth file ({os.path.basename(pth_path)}) in checkpoints folder.")
+        except Exception as e:
+            print(f"[ERROR] Error while saving model. Error {e}.")
+    
+    def wait(self):
+        """waits for the pending pth file to be written
+        """
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
      
     def save(
         self,
@@ -159,19 +206,19 @@ class ModelCheckpoint:
             metrics=metrics
         )
         
-        if len(self.history) == self.save_top_k:
-            for f in os.listdir(self.output_dir):
-                if self.to_remove is not None:
-                    if f.startswith(f"epoch={self.to_remove}"):
-                        os.remove(os.path.join(self.output_dir, f))
-        try:
-            torch.save(
-                state_dict,
-                os.path.join(self.output_dir, pth_filename)
-            )
-            print(f"Saved model pth file ({pth_filename}) in checkpoints folder.")
-        except Exception as e:
-            print(f"[ERROR] Error while saving model. Error {e}.")
+        self.wait()
+        if self.to_remove is not None and self.to_remove in self._epoch_to_path:
+            pth_path = self._epoch_to_path.pop(self.to_remove)
+            if os.path.exists(pth_path):
+                os.remove(pth_path)
+        
+        # copying weights to cpu so that next optimizer steps do not change them while writing
+        state_dict = {
+            k: v.detach().to("cpu", copy=True) if isinstance(v, torch.Tensor) else v for k, v in state_dict.items()
+        }
+        pth_path = os.path.join(self.output_dir, pth_filename)
+        self._epoch_to_path[epoch] = pth_path
+        self._pending = self._io_pool.submit(self._write, state_dict, pth_path)
            
     def step(
         self,
@@ -187,6 +234,7 @@ class ModelCheckpoint:
             state_dict (Dict): model state dict
         """
         
+        self.wait()
         self._update_history(
             val=metrics[self.monitor],
             epoch=epoch
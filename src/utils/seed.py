@@ -10,4 +10,22 @@ def seed_everything(seed):
 	torch.manual_seed(seed)
 	torch.cuda.manual_seed_all(seed)
 	torch.backends.cudnn.deterministic = True
-	torch.backends.cudnn.benchmark = False
\ No newline at end of file
+	torch.backends.cudnn.benchmark = False
+
+def seed_worker(worker_id: int, pin_cores: bool = False):
+	"""data loader worker_init_fn: seeds numpy and random in each worker (otherwise numpy RNG state is the same
+	for all workers, duplicating augmentations) and optionally pins each worker to a different CPU core (where supported).
+	Pinning keeps the first allowed core free for the main process; a pinned worker (and its OpenCV threads) runs on a single core.
+
+	Args:
+		worker_id (int): data loader worker id
+		pin_cores (bool, optional): pin worker to a CPU core. Defaults to False.
+	"""
+	seed = torch.initial_seed() % 2**32
+	np.random.seed(seed)
+	random.seed(seed)
+	if pin_cores and hasattr(os, "sched_setaffinity"):
+		cores = sorted(os.sched_getaffinity(0))
+		if len(cores) > 1:
+			cores = cores[1:]
+		os.sched_setaffinity(0, {cores[worker_id % len(cores)]})
\ No newline at end of file
@@ -4,6 +4,11 @@ from src.core import train
 
 ssl._create_default_https_context = ssl._create_unverified_context
 
+# Image decoding is the main bottleneck of the data loader workers. For a faster decoding:
+#   - install pillow-simd (pip uninstall pillow && CC="cc -mavx2" pip install -U --force-reinstall pillow-simd)
+#   - install accimage (conda install -c conda-forge accimage), used by src.io.read_rgb when available
+#   - link libjpeg-turbo (e.g. LD_PRELOAD=/path/to/libturbojpeg.so python train.py ...)
+
 def parse_args() -> argparse.Namespace:
     
     parser = argparse.ArgumentParser()